@@ -5,68 +5,321 @@ Usage: python bgchanger.py <query_term> [local_only]
 """
 
 import os
+import asyncio
+import base64
 import sys
 import json
 import hashlib
+import io
+import math
+import mmap
 import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.util.retry import Retry
 import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Protocol
 import ctypes
 from ctypes import wintypes
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
 from dotenv import load_dotenv
 load_dotenv()
 
+try:
+    import aiohttp  # Optional: fetch on a single event loop when installed
+except ImportError:
+    aiohttp = None
+
+try:
+    import blake3  # Optional: faster image hashing when installed
+except ImportError:
+    blake3 = None
+
+try:
+    import numpy
+    from PIL import Image  # Optional: needed by PhashHasher only
+except ImportError:
+    numpy = Image = None
+
+try:
+    from numba import njit  # Optional: compiles the PhashHasher inner loop
+except ImportError:
+    def njit(*args, **kwargs):
+        """Leave the function as plain Python when numba is not installed"""
+        return lambda func: func
+
+try:
+    import brotli  # Optional: decode br-compressed API responses
+except ImportError:
+    brotli = None
+
+try:
+    import ijson  # Optional: parse search results while they stream in
+except ImportError:
+    ijson = None
+
 # Constants
 PEXELS_API_URL = "https://api.pexels.com/v1/search"
 WALLPAPERS_DIR = Path("wallpapers")
-HASH_FILE = "image_hashes.json"
+HASH_FILE = "image_hashes.{name}.bin"  # Raw digests, one hasher.digest_size record each
+ETAG_FILE = "image_etags.log"  # ETag (or url:size) of every used image
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PARALLEL_DOWNLOADS = 5  # Candidate images downloaded at once
+DOWNLOAD_TIMEOUT = (5, 30)  # (connect, read) seconds for every Pexels request
+HTTP_POOL_SIZE = 8  # Kept-alive connections per host
+SEARCH_CACHE_TTL = 3600  # Seconds before a cached search is refreshed
+PREFETCH_COUNT = 3  # Images kept ready per query term
 DEFAULT_API_KEY = os.getenv("pexels_api_key")  # Replace with your actual API key
 
+JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError) if ijson is not None else (json.JSONDecodeError,)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'BM', b'GIF8')
+
 # Windows API constants
 SPI_SETDESKWALLPAPER = 20
 SPIF_UPDATEINIFILE = 0x01
 SPIF_SENDWININICHANGE = 0x02
 
+# Declare the signature once so ctypes converts the path straight to LPCWSTR
+if hasattr(ctypes, "windll"):
+    _SPI = ctypes.windll.user32.SystemParametersInfoW
+    _SPI.argtypes = [wintypes.UINT, wintypes.UINT, wintypes.LPCWSTR, wintypes.UINT]
+    _SPI.restype = wintypes.BOOL
+else:
+    _SPI = None
+
+class Hasher(Protocol):
+    """Strategy that turns image bytes into the digest used to spot repeats"""
+    name: str  # Used in the hash file name so digests never mix
+    digest_size: int
+    
+    def new(self):
+        """Return an incremental hash object with update() and digest()"""
+
+
+class ContentHasher:
+    """Exact byte-for-byte hash: BLAKE3 when installed, BLAKE2b otherwise"""
+    digest_size = 32
+    
+    def __init__(self):
+        self.name = "blake3" if blake3 is not None else "blake2b"
+    
+    def new(self):
+        if blake3 is not None:
+            return blake3.blake3()
+        return hashlib.blake2b(digest_size=self.digest_size)
+
+
+class PhashHasher:
+    """Perceptual hash of the picture rather than of the file bytes
+    
+    Repeats are still matched by exact digest, so a resized or re-encoded
+    copy only counts when every bit comes out the same, which is common
+    but not guaranteed. The digest holds 63 bits; the last one is padding.
+    """
+    name = "phash"
+    digest_size = 8
+    
+    def __init__(self):
+        if Image is None:
+            raise ImportError("PhashHasher needs Pillow and numpy installed")
+    
+    def new(self):
+        return _PhashState()
+
+
+class _PhashState:
+    """Collects the streamed bytes; the image has to be decoded as a whole"""
+    def __init__(self):
+        self._chunks = []
+    
+    def update(self, chunk):
+        self._chunks.append(bytes(chunk))
+    
+    def digest(self):
+        image = Image.open(io.BytesIO(b"".join(self._chunks)))
+        pixels = numpy.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=numpy.float64)
+        return numpy.packbits(_phash_bits(pixels)).tobytes()
+
+
+@njit(cache=True)
+def _phash_bits(pixels):
+    """63 pHash bits: the lowest 8x8 DCT terms, minus DC, against their median"""
+    n = pixels.shape[0]
+    cos_table = numpy.empty((8, n))
+    for u in range(8):
+        for x in range(n):
+            cos_table[u, x] = math.cos((2 * x + 1) * u * math.pi / (2 * n))
+    
+    coeffs = numpy.zeros((8, 8))
+    for u in range(8):
+        for v in range(8):
+            total = 0.0
+            for x in range(n):
+                for y in range(n):
+                    total += pixels[x, y] * cos_table[u, x] * cos_table[v, y]
+            coeffs[u, v] = total
+    
+    # Leave out the DC term, it only reflects overall brightness
+    ac_terms = coeffs.ravel()[1:]
+    return ac_terms > numpy.median(ac_terms)
+
+
+def hasher_from_name(name):
+    """Rebuild one of the built-in hashers from its name, or None if unknown"""
+    if name == PhashHasher.name:
+        return PhashHasher()
+    content_hasher = ContentHasher()
+    if name == content_hasher.name:
+        return content_hasher
+    return None
+
+
 class BackgroundChanger:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, hasher=None):
         self.api_key = api_key or DEFAULT_API_KEY
         self.base_dir = WALLPAPERS_DIR
-        self.hash_file_path = self.base_dir / HASH_FILE
-        self.used_hashes = self.load_used_hashes()
         
         # Create base wallpapers directory if it doesn't exist
         self.base_dir.mkdir(exist_ok=True)
+        
+        self._search_cache_dir = self.base_dir / ".search_cache"
+        self.hasher = hasher or ContentHasher()
+        self.hash_file_path = self.base_dir / HASH_FILE.format(name=self.hasher.name)
+        self.used_hashes = self.load_used_hashes()
+        self.etag_file_path = self.base_dir / ETAG_FILE
+        self.used_etags = self._read_log(self.etag_file_path)
+        self._hash_lock = threading.Lock()
+        self._session = self._create_session()
+        self._listing_cache = {}  # query_dir -> (mtime, image files)
+        self._resolved_paths = {}  # image path -> absolute path for the Windows API
+    
+    def _create_session(self):
+        """Create a keep-alive HTTP session shared by all Pexels requests"""
+        session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Authorization": self.api_key,
+            # urllib3 can only decode brotli when the package is installed
+            "Accept-Encoding": "gzip, br" if brotli is not None else "gzip",
+        })
+        return session
     
     def load_used_hashes(self):
-        """Load previously used image hashes from file"""
-        if self.hash_file_path.exists():
-            try:
-                with open(self.hash_file_path, 'r') as f:
-                    return set(json.load(f))
-            except (json.JSONDecodeError, IOError):
+        """Load previously used image digests from the packed hash file"""
+        if not self.hash_file_path.exists():
+            return self._seed_hashes()
+        try:
+            stride = self.hasher.digest_size
+            size = self.hash_file_path.stat().st_size
+            if size % stride:
+                # Drop a trailing partial record left by an interrupted write,
+                # otherwise every later append would be misaligned
+                size -= size % stride
+                os.truncate(self.hash_file_path, size)
+            if not size:
                 return set()
-        return set()
+            with open(self.hash_file_path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return {mm[i:i + stride] for i in range(0, size, stride)}
+        except IOError:
+            return set()
+    
+    def _seed_hashes(self):
+        """Start a new hash file from the wallpapers already on disk
+        
+        The file is keyed by hasher, so this runs on first use and whenever
+        the hasher changes (e.g. after installing blake3), carrying the
+        dedup history over instead of starting from nothing.
+        """
+        hashes = set()
+        for root, _, files in os.walk(self.base_dir):
+            for name in files:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    hashes.add(self.get_image_hash(os.path.join(root, name)))
+                except (IOError, ValueError) as e:
+                    print(f"Warning: Could not hash {name}: {e}")
+        
+        tmp_path = self._part_path(self.hash_file_path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(b''.join(hashes))
+            os.replace(tmp_path, self.hash_file_path)
+        except IOError as e:
+            print(f"Warning: Could not save hash file: {e}")
+        return hashes
+    
+    def reload_used(self):
+        """Pick up hashes and ETags a prefetch worker recorded since startup"""
+        with self._hash_lock:
+            self.used_hashes = self.load_used_hashes()
+            self.used_etags = self._read_log(self.etag_file_path)
     
-    def save_used_hashes(self):
-        """Save used image hashes to file"""
+    def _append_hash(self, image_hash):
+        """Append a single raw digest to the packed hash file"""
         try:
-            with open(self.hash_file_path, 'w') as f:
-                json.dump(list(self.used_hashes), f)
+            with open(self.hash_file_path, 'ab') as f:
+                f.write(image_hash)
         except IOError as e:
             print(f"Warning: Could not save hash file: {e}")
     
-    def get_image_hash(self, image_data):
-        """Calculate SHA-256 hash of image data"""
-        return hashlib.sha256(image_data).hexdigest()
+    @staticmethod
+    def _read_log(log_path):
+        """Read an append-only log into a set, one entry per line"""
+        try:
+            with open(log_path, 'r') as f:
+                return set(line.strip() for line in f if line.strip())
+        except IOError:
+            return set()
+    
+    @staticmethod
+    def _append_log(log_path, entry):
+        """Append a single entry to an append-only log"""
+        try:
+            with open(log_path, 'a') as f:
+                f.write(entry + '\n')
+        except IOError as e:
+            print(f"Warning: Could not save {log_path.name}: {e}")
+    
+    def _new_hash(self):
+        """Start an incremental image hash with the configured hasher"""
+        return self.hasher.new()
+    
+    def get_image_hash(self, image_path):
+        """Calculate the hash of an image file already on disk"""
+        h = self._new_hash()
+        with open(image_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+        return h.digest()
     
     def set_wallpaper(self, image_path):
         """Set Windows desktop wallpaper using ctypes"""
         try:
-            # Convert path to absolute path
-            abs_path = os.path.abspath(image_path)
+            # Convert path to absolute path, once per image
+            abs_path = self._resolved_paths.get(image_path)
+            if abs_path is None:
+                abs_path = str(Path(image_path).resolve())
+                self._resolved_paths[image_path] = abs_path
             
             # Call Windows API to set wallpaper
-            result = ctypes.windll.user32.SystemParametersInfoW(
+            result = _SPI(
                 SPI_SETDESKWALLPAPER,
                 0,
                 abs_path,
@@ -86,29 +339,44 @@ class BackgroundChanger:
     
     def download_image(self, url, save_path):
         """Download image from URL and save to specified path"""
+        part = self._stream_to_part(url, save_path)
+        if part is None:
+            return None
+        return self._commit_download(save_path, *part)
+    
+    def _stream_to_part(self, url, save_path, cancel=None):
+        """Download image into a .part file next to save_path
+        
+        Returns (tmp_path, image_hash, etag_key), or None if the image was
+        already used, the download failed or it was cancelled. Does not
+        touch the used hash sets.
+        """
+        tmp_path = self._part_path(save_path)
+        result = None
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Get image data
-            image_data = response.content
-            
-            # Check if we've used this image before
-            image_hash = self.get_image_hash(image_data)
-            if image_hash in self.used_hashes:
-                print("Image already used, skipping...")
+            head = self._session.head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+            etag_key = self._remote_key(head, url)
+            if self._is_known_remote(etag_key):
                 return None
             
-            # Save image
-            with open(save_path, 'wb') as f:
-                f.write(image_data)
-            
-            # Add hash to used set
-            self.used_hashes.add(image_hash)
-            self.save_used_hashes()
+            with self._session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                
+                # Stream the body to a temp file, hashing each chunk as it arrives
+                md5, content_md5 = self._start_md5(response.headers)
+                h = self._new_hash()
+                with open(tmp_path, 'wb') as tmp:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if cancel is not None and cancel.is_set():
+                            return None
+                        self._write_chunk(tmp, chunk, h, md5)
+                    self._sync_part(tmp)
             
-            print(f"Downloaded image: {save_path}")
-            return save_path
+            image_hash = self._finish_part(tmp_path, h, md5, content_md5)
+            if image_hash is None:
+                return None
+            result = tmp_path, image_hash, etag_key
+            return result
             
         except requests.RequestException as e:
             print(f"Error downloading image: {e}")
@@ -116,23 +384,295 @@ class BackgroundChanger:
         except IOError as e:
             print(f"Error saving image: {e}")
             return None
+        finally:
+            # Never leave a partial file behind
+            if result is None:
+                tmp_path.unlink(missing_ok=True)
+    
+    @staticmethod
+    def _part_path(save_path):
+        """Temp file a download is written to before being moved into place"""
+        return save_path.with_suffix(save_path.suffix + '.part')
+    
+    @staticmethod
+    def _write_chunk(tmp, chunk, h, md5):
+        """Hash one downloaded chunk and append it to the .part file"""
+        h.update(chunk)
+        if md5:
+            md5.update(chunk)
+        tmp.write(chunk)
+    
+    @staticmethod
+    def _sync_part(tmp):
+        """Make sure a finished .part file is on disk before it is renamed"""
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    
+    @staticmethod
+    def _is_image(image_path):
+        """Check the file starts with a JPEG, PNG, BMP or GIF signature"""
+        with open(image_path, 'rb') as f:
+            header = f.read(12)
+        if header.startswith(IMAGE_SIGNATURES):
+            return True
+        print("Downloaded file is not an image, discarding download")
+        return False
+    
+    def _is_known_remote(self, etag_key):
+        """Cheap duplicate check before pulling the body"""
+        if etag_key in self.used_etags:
+            print("Image already used, skipping...")
+            return True
+        return False
     
-    def fetch_from_pexels(self, query_term):
-        """Fetch a random image from Pexels API"""
+    @staticmethod
+    def _start_md5(headers):
+        """Return (md5, Content-MD5) to check the decoded body against
         
+        Both are None when the server sent no Content-MD5, or sent a
+        Content-Encoding: the digest then covers the encoded bytes, which
+        the HTTP clients never hand back.
+        """
+        content_md5 = headers.get('Content-MD5')
+        if not content_md5 or headers.get('Content-Encoding', 'identity') != 'identity':
+            return None, None
+        return hashlib.md5(usedforsecurity=False), content_md5
+    
+    def _finish_part(self, tmp_path, h, md5, content_md5):
+        """Validate a fully written .part file and return its digest, or None
+        
+        Chunks were hashed while streaming; only digest() waits for these
+        checks, so a non-image is never decoded or recorded.
+        """
+        if not self._md5_matches(md5, content_md5) or not self._is_image(tmp_path):
+            return None
+        return h.digest()
+    
+    @staticmethod
+    def _md5_matches(md5, content_md5):
+        """Check a download against the server's Content-MD5, if it sent one"""
+        if md5 is None:
+            return True
+        if base64.b64encode(md5.digest()).decode() == content_md5.strip():
+            return True
+        print("Checksum mismatch, discarding download")
+        return False
+    
+    @staticmethod
+    def _remote_key(head, url):
+        """Identify a remote image by its ETag, or by URL and size"""
+        if not head.ok:
+            return None
+        etag = head.headers.get('ETag')
+        if etag:
+            return etag
+        content_length = head.headers.get('Content-Length')
+        return f"{url}:{content_length}" if content_length else None
+    
+    def _commit_download(self, save_path, tmp_path, image_hash, etag_key=None):
+        """Claim image_hash and move a finished .part file into place"""
         try:
-            headers = {"Authorization": self.api_key}
-            params = {
-                "query": query_term,
-                "per_page": 80,  # Get more images to have variety
-                "page": random.randint(1, 10)  # Random page for more variety
-            }
+            with self._hash_lock:
+                # Check if we've used this image before
+                if image_hash in self.used_hashes:
+                    print("Image already used, skipping...")
+                    os.unlink(tmp_path)
+                    return None
+                
+                # Move the finished download into place
+                os.replace(tmp_path, save_path)
+                
+                # Add hash to used set
+                self.used_hashes.add(image_hash)
+                self._append_hash(image_hash)
+                if etag_key:
+                    self.used_etags.add(etag_key)
+                    self._append_log(self.etag_file_path, etag_key)
             
-            response = requests.get(PEXELS_API_URL, headers=headers, params=params)
-            response.raise_for_status()
+            print(f"Downloaded image: {save_path}")
+            return save_path
             
-            data = response.json()
-            photos = data.get("photos", [])
+        except IOError as e:
+            print(f"Error saving image: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return None
+    
+    @staticmethod
+    def _photo_save_path(photo, query_dir):
+        """Create filename from photo ID"""
+        photo_id, _ = photo
+        return query_dir / f"pexels_{photo_id}.jpg"
+    
+    def _is_downloaded(self, photo, query_dir):
+        """Check the query folder and its prefetch queue for a photo"""
+        return (self._photo_save_path(photo, query_dir).exists()
+                or self._photo_save_path(photo, self._prefetch_dir(query_dir.name)).exists())
+    
+    def _try_download(self, photo, query_dir, save_dir, cancel=None):
+        """Download a Pexels photo into save_dir without claiming its hash
+        
+        Returns (save_path, tmp_path, image_hash, etag_key) or None.
+        """
+        save_path = self._photo_save_path(photo, save_dir)
+        
+        # Skip if file already exists
+        if self._is_downloaded(photo, query_dir):
+            return None
+        
+        _, url = photo
+        part = self._stream_to_part(url, save_path, cancel)
+        if part is None:
+            return None
+        return (save_path,) + part
+    
+    def _download_first(self, photos, query_dir, save_dir):
+        """Download photos in parallel and keep the first unused one"""
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(photos))
+        futures = [
+            executor.submit(self._try_download, p, query_dir, save_dir, cancel)
+            for p in photos
+        ]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
+                    continue
+                downloaded_path = self._commit_download(*result)
+                if downloaded_path:
+                    return downloaded_path
+            return None
+        finally:
+            # Stop the losing downloads and throw away what they wrote
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in futures:
+                future.add_done_callback(self._discard_part)
+    
+    @staticmethod
+    def _discard_part(future):
+        """Remove the .part file left behind by an unclaimed download"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if result is not None:
+            result[1].unlink(missing_ok=True)
+    
+    @staticmethod
+    def _search_params(query_term, page):
+        """Build Pexels search parameters for one page of results"""
+        return {
+            "query": query_term,
+            "per_page": 80,  # Get more images to have variety
+            "page": page
+        }
+    
+    def _search_cache_path(self, query_term, page):
+        """Path of the cached search results for query_term and page"""
+        key = hashlib.blake2b(f"{query_term}:{page}".encode(), digest_size=16).hexdigest()
+        return self._search_cache_dir / f"{key}.json"
+    
+    @staticmethod
+    def _read_search_cache(cache_path, ttl=None):
+        """Load cached search results, or None if missing or older than ttl"""
+        try:
+            if ttl is not None and time.time() - cache_path.stat().st_mtime >= ttl:
+                return None
+            with open(cache_path, 'r') as f:
+                photos = json.load(f)
+            # Entries written before results were projected are ignored
+            return photos if isinstance(photos, list) else None
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def _write_search_cache(self, cache_path, photos):
+        """Store search results in the on-disk cache"""
+        try:
+            self._search_cache_dir.mkdir(exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump(photos, f)
+        except IOError as e:
+            print(f"Warning: Could not cache search results: {e}")
+    
+    def _stale_search(self, cache_path):
+        """Fall back to stale results rather than failing outright"""
+        photos = self._read_search_cache(cache_path)
+        if photos is not None:
+            print("Pexels search failed, using cached results")
+        return photos
+    
+    @staticmethod
+    def _project_photos(photos):
+        """Keep only (id, original image URL) of each search result"""
+        return [(photo["id"], photo["src"]["original"]) for photo in photos]
+    
+    def _cached_search(self, query_term, page, ttl=SEARCH_CACHE_TTL):
+        """Search Pexels, answering repeat queries from the on-disk cache
+        
+        Returns a list of (photo id, original image URL) pairs.
+        """
+        cache_path = self._search_cache_path(query_term, page)
+        photos = self._read_search_cache(cache_path, ttl)
+        if photos is not None:
+            return photos
+        
+        try:
+            params = self._search_params(query_term, page)
+            with self._session.get(PEXELS_API_URL, params=params, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                if ijson is not None:
+                    # Parse the photos as the body arrives instead of buffering it
+                    response.raw.decode_content = True
+                    photos = self._project_photos(ijson.items(response.raw, 'photos.item'))
+                else:
+                    photos = self._project_photos(response.json().get("photos", []))
+        except (requests.RequestException, urllib3.exceptions.HTTPError) + JSON_ERRORS as e:
+            photos = self._stale_search(cache_path)
+            if photos is None:
+                if isinstance(e, urllib3.exceptions.HTTPError):
+                    # Reading response.raw bypasses requests' own wrapping
+                    raise requests.ConnectionError(e) from e
+                raise
+            return photos
+        
+        self._write_search_cache(cache_path, photos)
+        return photos
+    
+    async def _cached_search_async(self, session, query_term, page, ttl=SEARCH_CACHE_TTL):
+        """Async counterpart of _cached_search"""
+        cache_path = self._search_cache_path(query_term, page)
+        photos = self._read_search_cache(cache_path, ttl)
+        if photos is not None:
+            return photos
+        
+        try:
+            params = self._search_params(query_term, page)
+            async with session.get(PEXELS_API_URL, params=params) as response:
+                response.raise_for_status()
+                if ijson is not None:
+                    photos = [p async for p in ijson.items(response.content, 'photos.item')]
+                else:
+                    photos = (await response.json()).get("photos", [])
+            photos = self._project_photos(photos)
+        except (aiohttp.ClientError, asyncio.TimeoutError) + JSON_ERRORS:
+            photos = self._stale_search(cache_path)
+            if photos is None:
+                raise
+            return photos
+        
+        self._write_search_cache(cache_path, photos)
+        return photos
+    
+    def fetch_from_pexels(self, query_term, prefetch=False):
+        """Fetch a random image from Pexels API
+        
+        With prefetch=True the image is saved to the prefetch queue for
+        query_term instead of the query folder.
+        """
+        
+        try:
+            page = random.randint(1, 10)  # Random page for more variety
+            photos = self._cached_search(query_term, page)
             
             if not photos:
                 print(f"No images found for query: {query_term}")
@@ -140,36 +680,148 @@ class BackgroundChanger:
                 self.get_local_image(query_term)
                 return None
             
-            # Try multiple images until we find one we haven't used
+            query_dir = self.base_dir / query_term
+            query_dir.mkdir(exist_ok=True)
+            save_dir = self._prefetch_dir(query_term) if prefetch else query_dir
+            save_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Try multiple images until we find one we haven't used,
+            # downloading a batch of candidates at a time in parallel
             random.shuffle(photos)
-            for photo in photos:
-                image_url = photo["src"]["original"]
+            for start in range(0, len(photos), PARALLEL_DOWNLOADS):
+                batch = photos[start:start + PARALLEL_DOWNLOADS]
+                downloaded_path = self._download_first(batch, query_dir, save_dir)
+                if downloaded_path:
+                    return downloaded_path
+            
+            print("All available images have been used")
+            return None
+            
+        except requests.RequestException as e:
+            print(f"Error fetching from Pexels API: {e}")
+            return None
+        except (KeyError,) + JSON_ERRORS as e:
+            print(f"Error parsing API response: {e}")
+            return None
+    
+    async def _fetch_async(self, query_term):
+        """Fetch a random image from Pexels API using aiohttp"""
+        
+        try:
+            headers = {"Authorization": self.api_key}
+            connector = aiohttp.TCPConnector(limit=PARALLEL_DOWNLOADS)
+            connect_timeout, read_timeout = DOWNLOAD_TIMEOUT
+            timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+                page = random.randint(1, 10)  # Random page for more variety
+                photos = await self._cached_search_async(session, query_term, page)
+                
+                if not photos:
+                    print(f"No images found for query: {query_term}")
+                    print(f"Quering local folders for query: {query_term}")
+                    self.get_local_image(query_term)
+                    return None
                 
-                # Create filename from photo ID
-                filename = f"pexels_{photo['id']}.jpg"
                 query_dir = self.base_dir / query_term
                 query_dir.mkdir(exist_ok=True)
-                save_path = query_dir / filename
-                
-                # Skip if file already exists
-                if save_path.exists():
-                    continue
                 
-                # Try to download
-                downloaded_path = self.download_image(image_url, save_path)
-                if downloaded_path:
-                    return downloaded_path
+                random.shuffle(photos)
+                for start in range(0, len(photos), PARALLEL_DOWNLOADS):
+                    batch = photos[start:start + PARALLEL_DOWNLOADS]
+                    downloaded_path = await self._download_first_async(session, batch, query_dir)
+                    if downloaded_path:
+                        return downloaded_path
             
             print("All available images have been used")
             return None
             
-        except requests.RequestException as e:
+        except aiohttp.ClientError as e:
             print(f"Error fetching from Pexels API: {e}")
             return None
-        except (KeyError, json.JSONDecodeError) as e:
+        except asyncio.TimeoutError:
+            print("Error fetching from Pexels API: request timed out")
+            return None
+        except (KeyError,) + JSON_ERRORS as e:
             print(f"Error parsing API response: {e}")
             return None
     
+    async def _download_first_async(self, session, photos, query_dir):
+        """Download photos concurrently and keep the first unused one"""
+        tasks = [
+            asyncio.create_task(self._download_async(session, p, query_dir))
+            for p in photos
+        ]
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is None:
+                        continue
+                    downloaded_path = self._commit_download(*result)
+                    if downloaded_path:
+                        return downloaded_path
+            return None
+        finally:
+            # Stop the losing downloads and throw away what they wrote
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in tasks:
+                self._discard_part(task)
+    
+    async def _download_async(self, session, photo, query_dir):
+        """Async counterpart of _try_download"""
+        save_path = self._photo_save_path(photo, query_dir)
+        if self._is_downloaded(photo, query_dir):
+            return None
+        
+        _, url = photo
+        tmp_path = self._part_path(save_path)
+        result = None
+        try:
+            async with session.head(url, allow_redirects=True) as head:
+                etag_key = self._remote_key(head, url)
+            if self._is_known_remote(etag_key):
+                return None
+            
+            async with session.get(url) as response:
+                response.raise_for_status()
+                
+                md5, content_md5 = self._start_md5(response.headers)
+                h = self._new_hash()
+                # Disk writes, hashing and fsync run off the event loop so the
+                # other downloads keep streaming meanwhile
+                tmp = await asyncio.to_thread(open, tmp_path, 'wb')
+                try:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(self._write_chunk, tmp, chunk, h, md5)
+                    await asyncio.to_thread(self._sync_part, tmp)
+                finally:
+                    tmp.close()
+            
+            # digest() may decode the whole image (PhashHasher), keep it off the loop
+            image_hash = await asyncio.to_thread(self._finish_part, tmp_path, h, md5, content_md5)
+            if image_hash is None:
+                return None
+            result = save_path, tmp_path, image_hash, etag_key
+            return result
+            
+        except aiohttp.ClientError as e:
+            print(f"Error downloading image: {e}")
+            return None
+        except asyncio.TimeoutError:
+            print(f"Error downloading image: timed out fetching {url}")
+            return None
+        except IOError as e:
+            print(f"Error saving image: {e}")
+            return None
+        finally:
+            # Never leave a partial file behind, including on cancellation
+            if result is None:
+                tmp_path.unlink(missing_ok=True)
+    
     def get_local_image(self, query_term):
         """Get a random unused local image from the query term folder"""
         query_dir = self.base_dir / query_term
@@ -178,12 +830,18 @@ class BackgroundChanger:
             print(f"Local folder not found: {query_dir}")
             return None
         
-        # Get all image files
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}
-        image_files = [
-            f for f in query_dir.iterdir() 
-            if f.is_file() and f.suffix.lower() in image_extensions
-        ]
+        # Get all image files, reusing the last listing if nothing changed
+        mtime = query_dir.stat().st_mtime
+        cached = self._listing_cache.get(query_dir)
+        if cached and cached[0] == mtime:
+            image_files = cached[1]
+        else:
+            with os.scandir(query_dir) as entries:
+                image_files = [
+                    e.path for e in entries
+                    if e.is_file(follow_symlinks=False) and e.name.lower().endswith(IMAGE_EXTENSIONS)
+                ]
+            self._listing_cache[query_dir] = (mtime, image_files)
         
         if not image_files:
             print(f"No image files found in: {query_dir}")
@@ -200,9 +858,114 @@ class BackgroundChanger:
             print(f"Using local images only for query: {query_term}")
             image_path = self.get_local_image(query_term)
         else:
+            image_path = self._pop_prefetched(query_term)
+            if not image_path:
+                print(f"Fetching new image for query: {query_term}")
+                self.reload_used()
+                image_path = self.fetch_from_pexels(query_term)
+            self._spawn_prefetch(query_term)
+        
+        return self._apply_wallpaper(image_path)
+    
+    async def change_background_async(self, query_term, local_only=False):
+        """Same as change_background, but fetches with aiohttp when installed"""
+        if local_only or aiohttp is None:
+            return self.change_background(query_term, local_only)
+        
+        image_path = self._pop_prefetched(query_term)
+        if not image_path:
             print(f"Fetching new image for query: {query_term}")
-            image_path = self.fetch_from_pexels(query_term)
+            self.reload_used()
+            image_path = await self._fetch_async(query_term)
+        self._spawn_prefetch(query_term)
+        return self._apply_wallpaper(image_path)
+    
+    def _prefetch_dir(self, query_term):
+        """Folder holding images downloaded ahead of time for query_term"""
+        return self.base_dir / ".prefetched" / query_term
+    
+    def _pop_prefetched(self, query_term):
+        """Move one prefetched image into the query folder and return it"""
+        prefetch_dir = self._prefetch_dir(query_term)
+        if not prefetch_dir.exists():
+            return None
+        
+        query_dir = self.base_dir / query_term
+        query_dir.mkdir(exist_ok=True)
+        for queued in self._queued_images(query_term):
+            image_path = query_dir / queued.name
+            try:
+                os.replace(queued, image_path)
+            except OSError:
+                continue
+            print(f"Using prefetched image for query: {query_term}")
+            return image_path
+        return None
+    
+    def _spawn_prefetch(self, query_term):
+        """Refill the prefetch queue for query_term in a detached process"""
+        # The worker has to dedup against the same hash file as we do
+        if hasher_from_name(self.hasher.name) is None:
+            return
+        if len(self._queued_images(query_term)) >= PREFETCH_COUNT:
+            return
+        try:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--prefetch", query_term,
+                 "--hasher", self.hasher.name],
+                creationflags=getattr(subprocess, "DETACHED_PROCESS", 0),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            print(f"Warning: Could not start prefetch worker: {e}")
+    
+    def prefetch(self, query_term, count=PREFETCH_COUNT):
+        """Download images until the prefetch queue holds count of them"""
+        prefetch_dir = self._prefetch_dir(query_term)
+        prefetch_dir.mkdir(parents=True, exist_ok=True)
         
+        # Only one worker per query term. The OS drops the lock when the
+        # process exits, so a crashed worker can't leave it stuck.
+        with open(prefetch_dir / ".lock", 'a') as lock_file:
+            if not self._try_lock(lock_file):
+                return
+            try:
+                while len(self._queued_images(query_term)) < count:
+                    if not self.fetch_from_pexels(query_term, prefetch=True):
+                        break
+            finally:
+                self._release_lock(lock_file)
+    
+    @staticmethod
+    def _try_lock(lock_file):
+        """Take an exclusive lock on lock_file without waiting for it"""
+        try:
+            if msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _release_lock(lock_file):
+        """Release a lock taken by _try_lock"""
+        if msvcrt is not None:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _queued_images(self, query_term):
+        """Images waiting in the prefetch queue for query_term"""
+        return list(self._prefetch_dir(query_term).glob("*.jpg"))
+    
+    def _apply_wallpaper(self, image_path):
+        """Set image_path as the wallpaper and report the outcome"""
         if image_path:
             success = self.set_wallpaper(image_path)
             if success:
@@ -217,6 +980,18 @@ def main():
         print("Usage: python bgchanger.py [local_only]")
         print("Example: python bgchanger.py true")
         sys.exit(1)
+    
+    # Background worker started by change_background:
+    # bgchanger.py --prefetch <query_term> [--hasher <name>]
+    if len(sys.argv) > 2 and sys.argv[1] == "--prefetch":
+        hasher = None
+        if len(sys.argv) > 4 and sys.argv[3] == "--hasher":
+            hasher = hasher_from_name(sys.argv[4])
+            if hasher is None:
+                sys.exit(1)
+        BackgroundChanger(hasher=hasher).prefetch(sys.argv[2])
+        return
+    
     term_list = ["mountains", "polygon", "abstract", "4k wallpaper", "landscape"]
     query_term = random.choice(term_list)
     local_only = False
@@ -229,7 +1004,7 @@ def main():
     bg_changer = BackgroundChanger()
     
     # Change the background
-    success = bg_changer.change_background(query_term, local_only)
+    success = asyncio.run(bg_changer.change_background_async(query_term, local_only))
     
     if not success:
         sys.exit(1)